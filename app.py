@@ -1,36 +1,447 @@
-import base64
+import binascii
+import hashlib
 import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+from functools import lru_cache, partial, reduce
+from itertools import islice
 import pandas as pd
-import matplotlib.pyplot as plt
-import PyPDF2
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
-import dash_daq as daq
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import numpy as np
 import plotly.graph_objs as go
 
+# Heavy modules only some uploads need are imported on first use, so a worker
+# that never sees a PDF or an Excel fallback never pays for loading them
+pdfium = None
+openpyxl = None
+numba = None
+
 # Create a Dash app instance
 app = dash.Dash(__name__)
 
-# Function to calculate dynamic metrics based on the provided DataFrame
-def calculate_metrics(df):
-    total_records = len(df)
+# Columns and dtypes learned on the first upload of each CSV, reused on re-uploads
+_SCHEMA_CACHE = {}
+
+# Columns the metrics are computed over (None means every column); 'valid' is always kept.
+# Read once per upload in the main process and handed to the parsers from there, since
+# pool workers re-import this module and never see a value set at runtime
+METRIC_COLUMNS = None
+
+# Number of rows parsed and measured at a time
+CHUNK_SIZE = 100_000
+
+# Function to tell whether a column takes part in the metrics of a column subset
+def is_metric_column(columns, col):
+    return columns is None or col in columns or col == "valid"
+
+# Function to pick the usecols argument for a file whose schema is not known yet
+def metric_usecols(columns):
+    return None if columns is None else partial(is_metric_column, columns)
+
+# Function to tag a cache key with the column subset its totals were measured over
+def metric_columns_tag(columns):
+    if columns is None:
+        return ""
+    names = "\0".join(sorted(str(col) for col in columns)).encode("utf-8")
+    return ":cols" + hashlib.blake2b(names, digest_size=8).hexdigest()
+
+# Function to parse an uploaded CSV straight from its raw bytes, one chunk at a time
+def read_csv_chunks(decoded, usecols=None, dtype=None):
+    return pd.read_csv(
+        io.BytesIO(decoded),
+        engine="c",
+        low_memory=False,
+        memory_map=False,
+        encoding="utf-8",
+        usecols=usecols,
+        dtype=dtype,
+        chunksize=CHUNK_SIZE,
+    )
+
+# Function to parse an uploaded Excel workbook without building its full object model
+def read_xlsx_chunks(decoded, usecols=None):
+    try:
+        df = pd.read_excel(io.BytesIO(decoded), engine="calamine", usecols=usecols)
+    except (ImportError, ValueError):
+        # python-calamine is not installed (or pandas is too old to know the engine)
+        df = None
+    if df is not None:
+        yield df
+        return
+
+    # Fall back to streaming the active sheet row by row with openpyxl
+    global openpyxl
+    if openpyxl is None:
+        import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(decoded), read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        while True:
+            block = list(islice(rows, CHUNK_SIZE))
+            if not block:
+                break
+            df = pd.DataFrame(block, columns=header)
+            if usecols is not None:
+                df = df[[col for col in df.columns if (usecols(col) if callable(usecols) else col in usecols)]]
+            yield df
+    finally:
+        wb.close()
+
+# Function to decode the base64 payload of a "data:<type>;base64,<payload>" upload
+def decode_upload(content):
+    # a2b_base64 reads an ASCII str in place, so slicing off the header is the only
+    # copy of the payload made before decoding (split(",") or encode() would add one)
+    return binascii.a2b_base64(content[content.index(",") + 1:])
+
+# Function to extract the text of every page of an uploaded PDF with PDFium
+def read_pdf_text(decoded):
+    global pdfium
+    if pdfium is None:
+        import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(decoded)
+    try:
+        text_data = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            text_data.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return text_data
+    finally:
+        pdf.close()
+
+# Distinct row hashes are kept as a sorted uint64 array: 8 bytes per row, where a
+# Python set of ints costs nearer 70
+_NO_HASHES = np.empty(0, dtype=np.uint64)
+_NO_COPIES = np.empty(0, dtype=np.uint32)
+
+# Row hashes up to this value are kept; anything lower means the hashes are sampled
+FULL_THRESHOLD = 2**64 - 1
+
+# Function to create empty running totals for the integrity metrics. Totals that may
+# be sampled also count the rows behind each kept hash ('copies'), which is what the
+# duplicate estimate is scaled up from
+def new_accumulator(sampled=False):
+    return {
+        "rows": 0, "cells": 0, "notnull": 0, "valid": 0, "unlabelled": 0, "threshold": FULL_THRESHOLD,
+        "seen": _NO_HASHES, "copies": _NO_COPIES if sampled else None,
+    }
+
+# Constants of the row hash, shared by the NumPy and Numba versions
+_HASH_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_HASH_MIX2 = np.uint64(0x94D049BB133111EB)
+_INT_TAG = np.uint64(0x9E3779B97F4A7C15)
+_FLOAT_TAG = np.uint64(0xC2B2AE3D27D4EB4F)
+_OTHER_TAG = np.uint64(0xD6E8FEB86659FD93)
+_INT64_LIMIT = 2.0 ** 63
+
+# Function to hash a column name the same way in every process
+@lru_cache(maxsize=4096)
+def column_name_hash(name):
+    return np.uint64(int.from_bytes(hashlib.blake2b(str(name).encode("utf-8"), digest_size=8).digest(), "little"))
+
+# Function to scramble hash words in place (the splitmix64 finaliser)
+def mix_words(x, scratch):
+    for shift, mult in ((30, _HASH_MIX1), (27, _HASH_MIX2), (31, None)):
+        np.right_shift(x, np.uint64(shift), out=scratch)
+        x ^= scratch
+        if mult is not None:
+            x *= mult
+
+# Function to turn one column into tagged hash words plus its null mask
+def column_words(series):
+    kind = series.dtype.kind if isinstance(series.dtype, np.dtype) else None
+    if kind in ("i", "u", "b"):
+        # Integers are hashed from their own 64-bit words: going through float64
+        # would merge distinct values above 2**53
+        words = series.to_numpy().astype(np.int64).view(np.uint64)
+        return words ^ _INT_TAG, None
+    if kind == "f":
+        # A column parses as int in a chunk without nulls and as float in one with
+        # them, so a float that is a whole number in int64 range hashes as that
+        # integer (-0.0 included); any other float hashes from its own bits
+        arr = series.to_numpy(dtype=np.float64)
+        null = np.isnan(arr)
+        whole = (arr == np.trunc(arr)) & (np.abs(arr) < _INT64_LIMIT)
+        ints = np.where(whole, arr, 0.0).astype(np.int64).view(np.uint64) ^ _INT_TAG
+        return np.where(whole, ints, arr.view(np.uint64) ^ _FLOAT_TAG), null
+    words = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    return words ^ _OTHER_TAG, series.isna().to_numpy()
+
+# Function to hash every row and count the non-null cells of a DataFrame.
+# A row hash is the sum of one scrambled word per non-null cell, each keyed on its
+# column name, so equal rows collide whatever order the columns come in, and a
+# column a file lacks counts like the all-null column pd.concat would add
+def row_hashes(df):
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    scratch = np.empty_like(hashes)
+    notnull = len(df) * df.shape[1]
+    for j, name in enumerate(df.columns):
+        words, null = column_words(df.iloc[:, j])
+        words ^= column_name_hash(name)
+        mix_words(words, scratch)
+        if null is not None:
+            words[null] = 0
+            notnull -= int(np.count_nonzero(null))
+        hashes += words
+    return hashes, notnull
+
+# Function to tell whether every column of a DataFrame is a plain NumPy number
+def is_numeric_frame(df):
+    return df.shape[1] > 0 and all(isinstance(dt, np.dtype) and dt.kind in "iubf" for dt in df.dtypes)
+
+# Non-null count, 'valid' sum and row hashes of a numeric block in a single
+# parallel sweep, so each cell is read from memory once instead of three times.
+# Integer columns are read from their own int64 block (int_pos maps a column to
+# it, -1 for float columns); the hashes are bit-for-bit the ones row_hashes makes
+def _fused_numeric_aggregates(arr, bits, ints, int_pos, names, valid_col):
+    n, m = arr.shape
+    hashes = np.empty(n, dtype=np.uint64)
+    notnull = 0
+    valid = 0.0
+    for i in numba.prange(n):
+        h = np.uint64(0)
+        for j in range(m):
+            if int_pos[j] >= 0:
+                w = np.uint64(ints[i, int_pos[j]]) ^ _INT_TAG
+            else:
+                v = arr[i, j]
+                if np.isnan(v):
+                    continue
+                if v == np.trunc(v) and abs(v) < _INT64_LIMIT:
+                    w = np.uint64(np.int64(v)) ^ _INT_TAG
+                else:
+                    w = bits[i, j] ^ _FLOAT_TAG
+            notnull += 1
+            w ^= names[j]
+            w ^= w >> np.uint64(30)
+            w *= _HASH_MIX1
+            w ^= w >> np.uint64(27)
+            w *= _HASH_MIX2
+            w ^= w >> np.uint64(31)
+            h += w
+        hashes[i] = h
+        if valid_col >= 0 and not np.isnan(arr[i, valid_col]):
+            valid += arr[i, valid_col]
+    return notnull, valid, hashes
+
+# Compiled kernel, or None when numba is not installed (False until first looked up)
+_FUSED_KERNEL = False
+
+# Function to import numba and compile the fused kernel the first time it is needed
+def get_fused_kernel():
+    global numba, _FUSED_KERNEL
+    if _FUSED_KERNEL is False:
+        try:
+            import numba
+        except ImportError:
+            # Numba is optional; without it numeric chunks go through the NumPy path
+            _FUSED_KERNEL = None
+        else:
+            _FUSED_KERNEL = numba.njit(parallel=True, cache=True)(_fused_numeric_aggregates)
+    return _FUSED_KERNEL
+
+# Function to sort and deduplicate row hashes (a plain sort beats np.unique's hash table here),
+# adding up the copies of each hash when they are counted
+def unique_hashes(hashes, copies=None, kind=None):
+    if copies is None:
+        hashes = np.sort(hashes, kind=kind)
+        if len(hashes) > 1:
+            hashes = hashes[np.concatenate(([True], hashes[1:] != hashes[:-1]))]
+        return hashes, None
+    order = np.argsort(hashes, kind=kind)
+    hashes = hashes[order]
+    copies = copies[order]
+    if len(hashes) > 1:
+        starts = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1])))
+        hashes = hashes[starts]
+        copies = np.add.reduceat(copies, starts, dtype=copies.dtype)
+    return hashes, copies
+
+# Function to combine two sorted arrays of distinct hashes (and their copies) into one
+def merge_hashes(a, a_copies, b, b_copies):
+    if not len(a) or not len(b):
+        return (b, b_copies) if not len(a) else (a, a_copies)
+    copies = None if a_copies is None or b_copies is None else np.concatenate([a_copies, b_copies])
+    # A stable sort finds the two sorted runs and merges them in linear time
+    return unique_hashes(np.concatenate([a, b]), copies, kind="stable")
+
+# Function to keep only the sorted hashes (and their copies) up to a threshold
+def hashes_upto(hashes, copies, threshold):
+    end = np.searchsorted(hashes, np.uint64(threshold), side="right")
+    return hashes[:end], None if copies is None else copies[:end]
+
+# Most distinct row hashes kept per file unless exact metrics are requested.
+# Sampling bounds the memory of the duplicate check, not its time: every row is still
+# parsed and hashed, so a sampled file is measured only slightly faster than an exact one
+SAMPLE_ROWS = 50_000
+
+# Function to fold one chunk of rows into the running totals
+def accumulate(acc, df, sample_rows=None):
+    acc["rows"] += len(df)
+    acc["cells"] += df.size
+
+    valid_col = df.columns.get_loc("valid") if "valid" in df.columns else -1
+    kernel = get_fused_kernel() if is_numeric_frame(df) and isinstance(valid_col, int) else None
+    if kernel is not None:
+        arr = np.ascontiguousarray(df.to_numpy(dtype=np.float64, na_value=np.nan))
+        int_cols = [j for j, dt in enumerate(df.dtypes) if dt.kind != "f"]
+        ints = np.ascontiguousarray(df.iloc[:, int_cols].to_numpy().astype(np.int64, copy=False).reshape(len(df), len(int_cols)))
+        int_pos = np.full(df.shape[1], -1, dtype=np.int64)
+        int_pos[int_cols] = np.arange(len(int_cols))
+        names = np.array([column_name_hash(name) for name in df.columns], dtype=np.uint64)
+        notnull, valid, hashes = kernel(arr, arr.view(np.uint64), ints, int_pos, names, valid_col)
+        valid = int(valid)
+    else:
+        hashes, notnull = row_hashes(df)
+        valid = int(df["valid"].sum()) if valid_col != -1 else 0
+    acc["notnull"] += int(notnull)
+
+    # Duplicates are found through the set of distinct row hashes, so repeats across
+    # chunks are counted too. When sampling, only hashes below the threshold are kept;
+    # equal rows share a hash, so they are kept or dropped together in every chunk
+    if acc["threshold"] < FULL_THRESHOLD:
+        hashes = hashes[hashes <= np.uint64(acc["threshold"])]
+    copies = None if acc["copies"] is None else np.ones(len(hashes), dtype=np.uint32)
+    seen, copies = merge_hashes(acc["seen"], acc["copies"], *unique_hashes(hashes, copies))
+    # Only files without a 'valid' column are sampled; labelled files stay exact
+    if sample_rows and valid_col == -1 and len(seen) > sample_rows:
+        # Halve the threshold until the kept hashes fit
+        threshold = acc["threshold"]
+        while np.searchsorted(seen, np.uint64(threshold), side="right") > sample_rows:
+            threshold //= 2
+        acc["threshold"] = threshold
+        seen, copies = hashes_upto(seen, copies, threshold)
+    acc["seen"] = seen
+    acc["copies"] = copies
+
+    # Rows without a 'valid' column are estimated when the metrics are finalized
+    if valid_col != -1:
+        acc["valid"] += valid
+    else:
+        acc["unlabelled"] += len(df)
+
+# Function to lower the hash threshold of some totals, dropping the hashes above it
+def thin_sample(acc, threshold):
+    if threshold < acc["threshold"]:
+        acc["threshold"] = threshold
+        acc["seen"], acc["copies"] = hashes_upto(acc["seen"], acc["copies"], threshold)
+
+# Function to estimate the number of distinct rows from the (possibly sampled) hashes
+def distinct_rows(acc):
+    if acc["threshold"] == FULL_THRESHOLD:
+        return len(acc["seen"])
+    return round(len(acc["seen"]) * (FULL_THRESHOLD + 1) / (acc["threshold"] + 1))
+
+# Function to count (or, from sampled hashes, estimate) the duplicate rows
+def duplicate_rows(acc):
+    if acc["threshold"] == FULL_THRESHOLD:
+        return acc["rows"] - len(acc["seen"])
+    if acc["copies"] is None:
+        return acc["rows"] - distinct_rows(acc)
+    # Every row repeating a kept row is a duplicate, and each distinct row is kept
+    # with the same chance, so scaling the repeats up gives an unbiased estimate
+    repeats = int(acc["copies"].sum()) - len(acc["seen"])
+    return round(repeats * (FULL_THRESHOLD + 1) / (acc["threshold"] + 1))
+
+# Function to fold the totals of one file into the totals of the whole upload
+def merge_accumulators(acc, other):
+    for key in ("rows", "cells", "notnull", "valid", "unlabelled"):
+        acc[key] += other[key]
+    if not acc["rows"] and acc["copies"] is None:
+        # Empty totals take on the other side's copy counting
+        acc["copies"] = None if other["copies"] is None else _NO_COPIES
+    # Both hash sets have to be sampled the same way before they can be combined
+    thin_sample(acc, other["threshold"])
+    acc["seen"], acc["copies"] = merge_hashes(
+        acc["seen"], acc["copies"], *hashes_upto(other["seen"], other["copies"], acc["threshold"])
+    )
+    return acc
+
+# Function to measure a sequence of DataFrame chunks
+def measure_chunks(chunks, sample_rows=None):
+    acc = new_accumulator(bool(sample_rows))
+    for chunk in chunks:
+        accumulate(acc, chunk, sample_rows)
+    return acc
+
+# Function to measure the chunks of a CSV while noting how each chunk typed its columns
+# Returns the totals, the columns, the dtypes every chunk agreed on and the columns
+# whose values parsed as different kinds in different chunks
+def scan_csv(decoded, usecols=None, dtype=None, sample_rows=None):
+    acc = new_accumulator(bool(sample_rows))
+    columns = []
+    dtypes = None
+    kinds = {}
+    for chunk in read_csv_chunks(decoded, usecols=usecols, dtype=dtype):
+        accumulate(acc, chunk, sample_rows)
+        columns = list(chunk.columns)
+        chunk_dtypes = chunk.dtypes.to_dict()
+        for col, dt in chunk_dtypes.items():
+            kinds.setdefault(col, set()).add(dt.kind if isinstance(dt, np.dtype) else str(dt))
+        if dtypes is None:
+            dtypes = chunk_dtypes
+        else:
+            # Only keep dtypes that every chunk agreed on
+            dtypes = {col: dt for col, dt in dtypes.items() if chunk_dtypes.get(col) == dt}
+    # Int and float chunks of one column already hash alike; anything else (a bool
+    # column with blanks turning object, a number column meeting a stray string)
+    # would hash equal values two ways
+    drifting = [col for col, seen in kinds.items() if len(seen) > 1 and not seen <= {"i", "u", "f"} and col != "valid"]
+    return acc, columns, dtypes or {}, drifting
+
+# Function to measure an uploaded CSV, reusing the schema seen on its last upload
+# Returns the totals together with the schema worth pinning on the next upload
+def measure_csv(decoded, schema=None, sample_rows=None, columns=None):
+    scanned = None
+    if schema is not None:
+        try:
+            scanned = scan_csv(decoded, schema["usecols"], schema["dtype"], sample_rows)
+        except (ValueError, TypeError):
+            # The file changed shape since it was last seen; learn its schema again
+            pass
+    if scanned is None:
+        usecols = metric_usecols(columns)
+        scanned = scan_csv(decoded, usecols, None, sample_rows)
+        schema = {"usecols": None if usecols is None else scanned[1], "dtype": scanned[2]}
+
+    acc, _, _, drifting = scanned
+    if drifting:
+        # Read the file again with those columns kept as text in every chunk, the
+        # way a single whole-file parse would have left them
+        schema = dict(schema, dtype=dict(schema["dtype"], **dict.fromkeys(drifting, str)))
+        acc = measure_chunks(read_csv_chunks(decoded, **schema), sample_rows)
+    return acc, schema
+
+# Function to turn running totals into the dashboard metrics
+def finalize_metrics(acc):
+    total_records = acc["rows"]
     if total_records == 0:
-        return {"completeness": 0, "consistency": 0, "overall_integrity": 0, "valid_records": 0, "invalid_records": 0}
+        return {"completeness": 0, "consistency": 0, "overall_integrity": 0, "valid_records": 0, "invalid_records": 0, "estimated": False}
 
     # Completeness: Percentage of non-null values
-    completeness = (df.notnull().mean().mean()) * 100
+    completeness = (acc["notnull"] / acc["cells"] * 100) if acc["cells"] else 0
 
     # Consistency: Placeholder (e.g., no duplicates)
-    consistency = 100 - (df.duplicated().sum() / total_records * 100)
+    # A sampled estimate can overshoot on tiny samples; bound it to the row count
+    duplicates = min(duplicate_rows(acc), total_records)
+    consistency = 100 - (duplicates / total_records * 100)
 
     # Overall Integrity: Weighted average of metrics
     overall_integrity = (0.6 * completeness + 0.4 * consistency)
 
     # Valid/Invalid Records (example: assume a column 'valid' exists)
-    valid_records = df["valid"].sum() if "valid" in df.columns else int(0.9 * total_records)
+    valid_records = acc["valid"] + int(0.9 * acc["unlabelled"])
     invalid_records = total_records - valid_records
 
     return {
@@ -39,6 +450,255 @@ def calculate_metrics(df):
         "overall_integrity": round(overall_integrity, 2),
         "valid_records": valid_records,
         "invalid_records": invalid_records,
+        "estimated": acc["threshold"] < FULL_THRESHOLD,
+    }
+
+# Function to measure an uploaded Excel workbook (no schema is pinned for these)
+def measure_xlsx(decoded, schema=None, sample_rows=None, columns=None):
+    return measure_chunks(read_xlsx_chunks(decoded, metric_usecols(columns)), sample_rows), None
+
+# Function to measure an uploaded PDF, one row of text per page
+def measure_pdf(decoded, schema=None, sample_rows=None, columns=None):
+    # Extract text from PDF and create a DataFrame
+    return measure_chunks([pd.DataFrame({"content": read_pdf_text(decoded)})], sample_rows), None
+
+# Measuring function for each supported file extension; register new formats here
+_HANDLERS = {".csv": measure_csv, ".xlsx": measure_xlsx, ".pdf": measure_pdf}
+
+# Function to get the lowercase extension uploads are dispatched on
+def file_extension(filename):
+    return os.path.splitext(filename)[1].lower()
+
+# Function to parse and measure one uploaded file (None for unsupported types)
+# Kept at module level so it can be sent to worker processes
+def measure_file(filename, decoded, schema=None, sample_rows=None, columns=None):
+    handler = _HANDLERS.get(file_extension(filename))
+    if handler is None:
+        return None, None
+    return handler(decoded, schema, sample_rows, columns)
+
+# Per-file totals keyed on the file contents, so re-uploads skip parsing entirely
+_TOTALS_CACHE = OrderedDict()
+_TOTALS_CACHE_SIZE = 32
+
+# Totals also persist in SQLite so a restarted server does not re-parse known files.
+# The database lives in the user's own cache directory, not next to the code or in the
+# shared temp directory, and entries unused for CACHE_MAX_AGE seconds, or past
+# CACHE_MAX_BYTES of row hashes, are evicted.
+# Bump METRICS_VERSION whenever the totals or their formulas change to ignore stale rows
+METRICS_VERSION = 4
+CACHE_DB = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "data_integrity_checker", "totals.db"
+)
+CACHE_MAX_AGE = 7 * 24 * 3600
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Function to open the persistent totals cache, creating its table on first use
+def open_cache():
+    # Private to the user, so nobody else can plant or read cached totals
+    os.makedirs(os.path.dirname(CACHE_DB), mode=0o700, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB)
+    # Only takes effect on a new database; lets evictions shrink the file
+    conn.execute("PRAGMA auto_vacuum = FULL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS file_totals (key TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+        "counts TEXT NOT NULL, seen BLOB NOT NULL, last_used REAL NOT NULL)"
+    )
+    return conn
+
+# Function to load the persisted totals of a file (None when unknown or stale)
+def load_totals(key):
+    try:
+        with closing(open_cache()) as conn, conn:
+            row = conn.execute(
+                "SELECT counts, seen FROM file_totals WHERE key = ? AND version = ?", (key, METRICS_VERSION)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE file_totals SET last_used = ? WHERE key = ?", (time.time(), key))
+    except (sqlite3.Error, OSError):
+        # An unreadable cache only costs a re-parse
+        return None
+    if row is None:
+        return None
+    file_totals = json.loads(row[0])
+    # The blob holds the hashes, then their copies when those were counted
+    kept = len(row[1]) // (12 if file_totals["copies"] else 8)
+    file_totals["seen"] = np.frombuffer(row[1], dtype=np.uint64, count=kept)
+    file_totals["copies"] = np.frombuffer(row[1], dtype=np.uint32, offset=8 * kept) if file_totals["copies"] else None
+    return file_totals
+
+# Function to drop stale, expired and least recently used entries past the size cap
+def evict_totals(conn):
+    now = time.time()
+    conn.execute(
+        "DELETE FROM file_totals WHERE version != ? OR last_used < ?", (METRICS_VERSION, now - CACHE_MAX_AGE)
+    )
+    used = 0
+    expired = []
+    for key, size in conn.execute("SELECT key, length(seen) FROM file_totals ORDER BY last_used DESC"):
+        used += size
+        if used > CACHE_MAX_BYTES:
+            expired.append((key,))
+    conn.executemany("DELETE FROM file_totals WHERE key = ?", expired)
+
+# Function to persist the totals of a file, with its row hashes packed as uint64
+def store_totals(key, file_totals):
+    counts = {name: value for name, value in file_totals.items() if name != "seen"}
+    counts["copies"] = file_totals["copies"] is not None
+    blob = file_totals["seen"].tobytes()
+    if counts["copies"]:
+        blob += file_totals["copies"].tobytes()
+    if len(blob) > CACHE_MAX_BYTES:
+        # The size cap would evict it straight away; skip the write altogether
+        return
+    try:
+        with closing(open_cache()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO file_totals (key, version, counts, seen, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, METRICS_VERSION, json.dumps(counts), blob, time.time()),
+            )
+            evict_totals(conn)
+    except (sqlite3.Error, OSError):
+        # Failing to persist is harmless; the in-memory cache still has the totals
+        pass
+
+# Worker processes for parsing several uploads at once, started on first use
+_POOL = None
+
+# Least total upload size worth sending to the pool: spawning a worker re-imports pandas
+# and this module, which takes seconds, while 64 MB of CSV parses in about a second
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+def get_pool():
+    global _POOL
+    if _POOL is None:
+        # Workers are spawned rather than forked: a fork taken after Numba has started
+        # its threading layer inherits locks held by threads that no longer exist,
+        # and the child hangs instead of exiting
+        _POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+    return _POOL
+
+# Function to measure a batch of files in parallel (returns (totals, schema) pairs)
+def measure_files_parallel(files):
+    global _POOL
+    try:
+        futures = [get_pool().submit(measure_file, *file) for file in files]
+    except (BrokenProcessPool, OSError):
+        # The workers could not be started
+        futures = None
+    if futures is not None:
+        try:
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A worker died; errors raised by a file's own parse still propagate
+            pass
+
+    # Processes are unavailable here; threads still overlap the C parser,
+    # which releases the GIL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        return list(pool.map(lambda file: measure_file(*file), files))
+
+# Function to tell whether a batch of files is worth measuring in worker processes
+def worth_parallel(files):
+    return len(files) > 1 and (os.cpu_count() or 1) > 1 and sum(len(file[1]) for file in files) >= PARALLEL_MIN_BYTES
+
+# Function to keep the totals of a file in the in-memory cache
+def remember_totals(key, file_totals):
+    _TOTALS_CACHE[key] = file_totals
+    # Evict the least recently used file once the cache is full
+    if len(_TOTALS_CACHE) > _TOTALS_CACHE_SIZE:
+        _TOTALS_CACHE.popitem(last=False)
+
+# Function to measure every uploaded file, reusing the totals of identical uploads
+def measure_uploads(uploads, sample_rows=None):
+    columns = METRIC_COLUMNS
+    tag = metric_columns_tag(columns)
+    results = [None] * len(uploads)
+    pending = []
+    for i, (filename, decoded) in enumerate(uploads):
+        ext = file_extension(filename)
+        if ext not in _HANDLERS:
+            # Unsupported files are skipped before they are hashed or sent to a worker
+            continue
+        key = ext + ":" + hashlib.blake2b(decoded, digest_size=16).hexdigest() + tag
+        if sample_rows:
+            # Sampled totals must never be served when exact ones are asked for
+            key += ":sampled%d" % sample_rows
+        if key in _TOTALS_CACHE:
+            _TOTALS_CACHE.move_to_end(key)
+            results[i] = _TOTALS_CACHE[key]
+            continue
+
+        file_totals = load_totals(key)
+        if file_totals is not None:
+            remember_totals(key, file_totals)
+            results[i] = file_totals
+        else:
+            pending.append((i, key, filename, decoded))
+
+    files = [
+        (filename, decoded, _SCHEMA_CACHE.get(filename + tag), sample_rows, columns) for _, _, filename, decoded in pending
+    ]
+    if worth_parallel(files):
+        measured = measure_files_parallel(files)
+    else:
+        # A single file, a small batch or a single CPU is not worth the cost of
+        # starting workers and shipping the files to them
+        measured = [measure_file(*file) for file in files]
+
+    for (i, key, filename, _), (file_totals, schema) in zip(pending, measured):
+        if schema is not None:
+            _SCHEMA_CACHE[filename + tag] = schema
+        if file_totals is not None:
+            remember_totals(key, file_totals)
+            store_totals(key, file_totals)
+        results[i] = file_totals
+    return results
+
+# Function to build the pie chart figure for Valid/Invalid Records
+# uirevision follows the figure's values, so the client keeps the user's zoom and hidden
+# legend entries only when the same figure comes back
+@lru_cache(maxsize=128)
+def pie_figure(valid_records, invalid_records):
+    return {
+        "data": [
+            go.Pie(
+                labels=["Valid", "Invalid"],
+                values=[valid_records, invalid_records],
+                marker=dict(colors=["#2ecc71", "#e74c3c"]),
+            )
+        ],
+        "layout": {
+            "title": "Valid vs Invalid Records",
+            "showlegend": True,
+            "uirevision": f"{valid_records}:{invalid_records}",
+            "annotations": [
+                {
+                    "text": f"Valid: {valid_records}, Invalid: {invalid_records}",
+                    "x": 0.5,
+                    "y": 0.5,
+                    "showarrow": False,
+                    "font": {"size": 18, "color": "#2c3e50"},
+                }
+            ],
+        },
+    }
+
+# Function to build the bar chart figure for Completeness and Consistency
+@lru_cache(maxsize=128)
+def bar_figure(completeness, consistency):
+    return {
+        "data": [
+            go.Bar(
+                x=["Completeness", "Consistency"],
+                y=[completeness, consistency],
+                marker=dict(color=["#3498db", "#f39c12"]),
+            )
+        ],
+        "layout": go.Layout(title="Integrity Metrics", yaxis={"title": "Percentage"}, uirevision=f"{completeness}:{consistency}"),
     }
 
 # Layout of the Dash App
@@ -80,6 +740,12 @@ app.layout = html.Div(
                     },
                     multiple=True,
                 ),
+                dcc.Checklist(
+                    id="exact-metrics",
+                    options=[{"label": " Exact metrics (keeps every row hash of large files in memory)", "value": "exact"}],
+                    value=[],
+                    style={"font-size": "14px", "color": "#2c3e50"},
+                ),
             ],
         ),
 
@@ -122,86 +788,38 @@ app.layout = html.Div(
         Output("loading-output", "children"),
     ],
     Input("file-upload", "contents"),
+    Input("exact-metrics", "value"),
     State("file-upload", "filename"),
 )
-def update_visualizations(contents, filenames):
+def update_visualizations(contents, exact, filenames):
     if contents is not None:
-        all_data = []
+        uploads = []
         for content, filename in zip(contents, filenames):
-            _, content_string = content.split(",")
-            decoded = base64.b64decode(content_string)
-
-            if filename.endswith(".csv"):
-                df = pd.read_csv(io.StringIO(decoded.decode("utf-8")))
-            elif filename.endswith(".xlsx"):
-                df = pd.read_excel(io.BytesIO(decoded), engine="openpyxl")
-            elif filename.endswith(".pdf"):
-                # Extract text from PDF and create a DataFrame
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(decoded))
-                text_data = [page.extract_text() for page in pdf_reader.pages]
-                df = pd.DataFrame({"content": text_data})
-            else:
-                continue
-
-            all_data.append(df)
-
-        # Combine all uploaded data
-        combined_df = pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
-
-        # Calculate metrics
-        metrics = calculate_metrics(combined_df)
-
-        # Create a pie chart for Valid/Invalid Records
-        pie_chart = dcc.Graph(
-            figure={
-                "data": [
-                    go.Pie(
-                        labels=["Valid", "Invalid"],
-                        values=[metrics["valid_records"], metrics["invalid_records"]],
-                        marker=dict(colors=["#2ecc71", "#e74c3c"]),
-                    )
-                ],
-                "layout": {
-                    "title": "Valid vs Invalid Records",
-                    "showlegend": True,
-                    "annotations": [
-                        {
-                            "text": f"Valid: {metrics['valid_records']}, Invalid: {metrics['invalid_records']}",
-                            "x": 0.5,
-                            "y": 0.5,
-                            "showarrow": False,
-                            "font": {"size": 18, "color": "#2c3e50"},
-                        }
-                    ],
-                },
-            }
-        )
+            uploads.append((filename, decode_upload(content)))
 
-        # Create a simple bar plot using matplotlib for Completeness and Consistency
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.bar(
-            ["Completeness", "Consistency"],
-            [metrics["completeness"], metrics["consistency"]],
-            color=["#3498db", "#f39c12"],
-        )
-        ax.set_title("Integrity Metrics")
-        ax.set_ylabel("Percentage")
+        sample_rows = None if "exact" in (exact or []) else SAMPLE_ROWS
+        totals = reduce(merge_accumulators, filter(None, measure_uploads(uploads, sample_rows)), new_accumulator())
+
+        # Calculate metrics from the totals of every uploaded file
+        metrics = finalize_metrics(totals)
 
-        # Convert matplotlib figure to PNG image to display in Dash
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png")
-        buf.seek(0)
-        img_str = base64.b64encode(buf.read()).decode("utf-8")
-        img_uri = f"data:image/png;base64,{img_str}"
+        # Figures come from a cache keyed on the (already rounded) metrics
+        pie_chart = dcc.Graph(figure=pie_figure(int(metrics["valid_records"]), int(metrics["invalid_records"])))
+        bar_chart = dcc.Graph(figure=bar_figure(metrics["completeness"], metrics["consistency"]))
 
         # Display percentages
         overall_integrity = f"Overall Integrity: {metrics['overall_integrity']}% (Completeness: {metrics['completeness']}%, Consistency: {metrics['consistency']}%)"
+        status = "Metrics successfully calculated."
+        if metrics["estimated"]:
+            # Make it obvious the duplicate count comes from a sample of the row hashes
+            overall_integrity = f"Estimated {overall_integrity}"
+            status = "Consistency estimated from a sample of rows. Tick 'Exact metrics' for exact values."
         
         return (
             html.Div([html.H4(overall_integrity)]),
             pie_chart,
-            html.Img(src=img_uri, style={"width": "100%", "height": "auto"}),
-            "Metrics successfully calculated.",
+            bar_chart,
+            status,
         )
 
     return {}, {}, {}, "Upload your files to see results."
@@ -1,8 +1,7 @@
 import base64
 import io
+from functools import reduce
 import pandas as pd
-import matplotlib.pyplot as plt
-import PyPDF2
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
@@ -11,17 +10,25 @@ import plotly.graph_objs as go
 # Initialize Dash app
 app = dash.Dash(__name__)
 
-# Function to calculate integrity metrics
-def calculate_metrics(df):
-    total_records = len(df)
+# Function to collect the raw counts behind the metrics for one file:
+# (rows, cells, non-null cells, duplicate rows, valid rows, rows without a 'valid' column)
+def raw_aggs(df):
+    rows = len(df)
+    has_valid = "valid" in df.columns
+    valid = int(df["valid"].sum()) if has_valid else 0
+    return (rows, df.size, int(df.count().sum()), int(df.duplicated().sum()), valid, 0 if has_valid else rows)
+
+# Function to calculate integrity metrics from raw counts
+def metrics_from_aggs(aggs):
+    total_records, cells, notnull, duplicates, valid, unlabelled = aggs
     if total_records == 0:
         return {"completeness": 0, "consistency": 0, "overall_integrity": 0, "valid_records": 0, "invalid_records": 0}
     
-    completeness = (df.notnull().mean().mean()) * 100
-    consistency = 100 - (df.duplicated().sum() / total_records * 100)
+    completeness = (notnull / cells * 100) if cells else 0
+    consistency = 100 - (duplicates / total_records * 100)
     overall_integrity = (0.6 * completeness + 0.4 * consistency)
     
-    valid_records = df["valid"].sum() if "valid" in df.columns else int(0.9 * total_records)
+    valid_records = valid + int(0.9 * unlabelled)
     invalid_records = total_records - valid_records
     
     return {
@@ -84,6 +91,8 @@ def update_visualizations(contents, filenames):
         elif filename.endswith(".xlsx"):
             df = pd.read_excel(io.BytesIO(decoded), engine="openpyxl")
         elif filename.endswith(".pdf"):
+            # PyPDF2 is only imported once a PDF is actually uploaded
+            import PyPDF2
             pdf_reader = PyPDF2.PdfReader(io.BytesIO(decoded))
             text_data = [page.extract_text() for page in pdf_reader.pages]
             df = pd.DataFrame({"content": text_data})
@@ -92,8 +101,9 @@ def update_visualizations(contents, filenames):
         
         all_data.append(df)
     
-    combined_df = pd.concat(all_data, ignore_index=True) if all_data else pd.DataFrame()
-    metrics = calculate_metrics(combined_df)
+    # Sum the counts of each file instead of concatenating them (duplicates across files are not counted)
+    aggs = reduce(lambda a, b: tuple(x + y for x, y in zip(a, b)), (raw_aggs(df) for df in all_data), (0,) * 6)
+    metrics = metrics_from_aggs(aggs)
     
     # Pie Chart for Valid vs Invalid Records
     pie_chart = dcc.Graph(